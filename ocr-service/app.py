@@ -6,35 +6,136 @@ multiple image formats as well as PDF files.
 """
 
 import os
+
+# Run each Tesseract process single-threaded. OpenMP coordination costs more than it
+# gains for receipt-sized images; parallelism comes from concurrent requests and the
+# OCR process pool instead. Must be set before Tesseract is loaded.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import asyncio
+import functools
+import hashlib
 import tempfile
 import uuid
 import time
 import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Callable, Optional, List
 
 import pytesseract
+from cachetools import LRUCache
 from fastapi import FastAPI, File, UploadFile, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
 from PIL import Image
 import fitz  # PyMuPDF
 from dotenv import load_dotenv
 
+try:
+    import re2  # google-re2: linear-time regex engine
+except ImportError:
+    re2 = None
+
+try:
+    import tesserocr  # in-process libtesseract bindings
+except ImportError:
+    tesserocr = None
+
 # Load environment variables
 load_dotenv()
 
 # Configuration
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # 10MB default
+UPLOAD_CHUNK_SIZE = 64 * 1024  # Uploads are streamed to disk in chunks of this size
 ALLOWED_FILE_TYPES = {
     "image/jpeg", "image/jpg", "image/png", "image/bmp", "image/tiff",
     "application/pdf"
 }
+# Number of OCR results kept in memory, keyed by uploaded content hash
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", 256))
+# Images with a longer side than this are downscaled before OCR
+OCR_MAX_DIM = int(os.getenv("OCR_MAX_DIM", 2500))
+PDF_OCR_PAGE_LIMIT = int(os.getenv("PDF_OCR_PAGE_LIMIT", 5))
+# Resolution used to render scanned PDF pages for OCR
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", 200))
+# Number of uvicorn worker processes; each has its own OCR pool and result cache
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", os.cpu_count() or 1))
+# Number of processes each uvicorn worker uses to OCR images and scanned PDF pages in parallel.
+# The default shares the cores between the workers, so one Tesseract runs per core.
+OCR_CONCURRENCY = int(os.getenv(
+    "OCR_CONCURRENCY", max(min((os.cpu_count() or 1) // max(MAX_WORKERS, 1), 4), 1)
+))
+# Run Tesseract in-process via tesserocr when installed (falls back to the pytesseract CLI)
+USE_TESSEROCR = os.getenv("OCR_USE_TESSEROCR", "true").lower() == "true" and tesserocr is not None
+# Use RE2 for structured field extraction when installed (falls back to stdlib re)
+USE_RE2 = os.getenv("OCR_USE_RE2", "true").lower() == "true" and re2 is not None
+_field_re = re2 if USE_RE2 else re
+
+# Field extraction patterns, compiled on first use by _compiled_fieldset(). Each field
+# group is fused into a single alternation so the OCR text is scanned once per group.
+# Patterns stay within the syntax subset shared by RE2 and the stdlib re module.
+_TOTAL_PATTERN = (
+    r'(?P<keyword>GRAND\s*TOTAL|SUBTOTAL|TOTAL|AMOUNT|SUM|BALANCE|USD)[:\s]*\$?(?P<amount>\d+(?:,\d{3})*(?:\.\d{2})?)'
+    r'|\$?(?P<usd_amount>\d+(?:,\d{3})*(?:\.\d{2})?)\s*USD'
+)
+# Preference among total keywords (lower wins), keyed by the first 5 characters
+_TOTAL_PRIORITY = {"GRAND": 0, "TOTAL": 1, "SUBTO": 2, "AMOUN": 3, "SUM": 4, "BALAN": 5, "USD": 6}
+# At least one of these must appear in the text for the total pattern to match
+_TOTAL_KEYWORDS = ("TOTAL", "AMOUNT", "SUM", "BALANCE", "USD")
+
+_DATE_PATTERN = (
+    r'(?P<date>'
+    r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'  # MM/DD/YYYY or DD/MM/YYYY
+    r'|\d{4}[/-]\d{1,2}[/-]\d{1,2}'  # YYYY-MM-DD
+    r'|\d{1,2}\s+(?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s+\d{2,4}'  # DD MMM YYYY
+    r'|(?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s+\d{1,2},?\s+\d{2,4}'  # MMM DD, YYYY
+    r')'
+)
+
+_INVOICE_PATTERN = (
+    r'(?P<keyword>INVOICE|BILL|RECEIPT|ORDER|REF(?:ERENCE)?|ACC(?:OUNT)?)[:\s#]*(?P<number>\w+(?:[-/]\w+)*)'
+)
+# Preference among invoice keywords (lower wins), keyed by the first 3 characters
+_INVOICE_PRIORITY = {"INV": 0, "BIL": 1, "REC": 2, "ORD": 3, "REF": 4, "ACC": 5}
+_INVOICE_KEYWORDS = ("INVOICE", "BILL", "RECEIPT", "ORDER", "REF", "ACC")
+# Every spelling the keyword group can match; a captured number equal to one of these
+# is the next keyword (e.g. "BILL INVOICE 123"), so matching resumes from it
+_INVOICE_KEYWORD_WORDS = frozenset(
+    ("INVOICE", "BILL", "RECEIPT", "ORDER", "REF", "REFERENCE", "ACC", "ACCOUNT")
+)
+
+# Matched against the newline-joined header lines; [ \t] keeps matches within one line
+_VENDOR_PATTERN = (
+    r'(?m)^(?P<company>[^\n]{1,80}?)[ \t]+(?:INC|LLC|CORP|CORPORATION|CO|COMPANY|LTD|LIMITED)'
+    r'|(?:FROM|VENDOR|SUPPLIER|MERCHANT):[ \t]*(?P<named>.+)'
+)
+_VENDOR_KEYWORDS = ("INC", "LLC", "CO", "LTD", "LIMITED", "FROM", "VENDOR", "SUPPLIER", "MERCHANT")
+
+# A line containing one of these is taken as the document title
+_TITLE_KEYWORDS = ("INVOICE", "BILL", "RECEIPT", "STATEMENT")
+
+
+@functools.cache
+def _compiled_fieldset() -> Dict[str, Any]:
+    """Compile the field extraction patterns on the first OCR request and reuse them afterwards."""
+    return {
+        "total": _field_re.compile(_TOTAL_PATTERN),
+        "date": _field_re.compile(_DATE_PATTERN),
+        "invoice": _field_re.compile(_INVOICE_PATTERN),
+        "vendor": _field_re.compile(_VENDOR_PATTERN),
+    }
+
 
 # Pydantic Models
 class ExtractedFields(BaseModel):
     """Structured fields extracted from bill text."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     total: Optional[float] = Field(None, description="Total amount found in the bill")
     title: Optional[str] = Field(None, description="Bill title or vendor name")
     date: Optional[str] = Field(None, description="Bill date")
@@ -43,6 +144,8 @@ class ExtractedFields(BaseModel):
 
 class OCRMetadata(BaseModel):
     """Metadata about the OCR processing."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     original_filename: Optional[str] = Field(None, description="Original uploaded filename")
     content_type: Optional[str] = Field(None, description="MIME type of the file")
     file_size: Optional[int] = Field(None, description="File size in bytes")
@@ -55,6 +158,8 @@ class OCRMetadata(BaseModel):
 
 class OCRResponse(BaseModel):
     """Standard OCR response structure."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     success: bool = Field(True, description="Whether OCR processing was successful")
     extracted_text: str = Field(..., description="Full extracted text from the document")
     parsed_fields: ExtractedFields = Field(..., description="Structured extracted fields")
@@ -62,10 +167,15 @@ class OCRResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     """Health check response."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     status: str = Field(..., description="Service health status")
     service: str = Field(..., description="Service name")
     version: str = Field(..., description="Service version")
     tesseract_available: bool = Field(..., description="Whether Tesseract OCR is available")
+    tesseract_thread_limit: Optional[int] = Field(
+        None, description="OpenMP threads per Tesseract process (None if OMP_THREAD_LIMIT is not a number)"
+    )
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -73,7 +183,8 @@ app = FastAPI(
     description="OCR service for extracting text from bill images and PDFs",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for local development
@@ -89,120 +200,227 @@ app.add_middleware(
 TESSERACT_CMD = os.getenv("TESSERACT_CMD", "/usr/bin/tesseract")
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
+# Process pool for CPU-bound OCR of images and scanned PDF pages, created on first use
+# and replaced if one of its workers dies (e.g. a Tesseract crash or an OOM kill)
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+# Per-process tesserocr API: the model is loaded once and stays resident in each OCR
+# pool worker. The API is not thread-safe, so calls within a process are serialized.
+_tess_api = None
+_tess_lock = threading.Lock()
+
+# OCR results of recent uploads: (sha256 digest, content type) -> (text, confidence, metadata, lines).
+# OCR_CACHE_SIZE <= 0 disables caching.
+_ocr_cache: Optional[LRUCache] = LRUCache(maxsize=OCR_CACHE_SIZE) if OCR_CACHE_SIZE > 0 else None
 
-def extract_structured_fields(text: str) -> ExtractedFields:
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    """Return the OCR process pool, starting a new one if there is none."""
+    global _ocr_pool
+    if _ocr_pool is None:
+        # Spawned rather than forked: a fork could copy the tesserocr API mid-call
+        # from another thread, and workers import this module fresh anyway
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=OCR_CONCURRENCY, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _ocr_pool
+
+
+def _discard_ocr_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken OCR pool so the next _get_ocr_pool() call starts fresh workers."""
+    global _ocr_pool
+    if _ocr_pool is pool:
+        _ocr_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _split_lines(text: str) -> List[str]:
+    """Split text into stripped, non-empty lines (each line is stripped once)."""
+    return [stripped for line in text.split('\n') if (stripped := line.strip())]
+
+
+def extract_structured_fields(text: str, lines: Optional[List[str]] = None) -> ExtractedFields:
     """
     Extract structured fields from OCR text using pattern matching.
 
     Args:
         text: Extracted text from OCR
+        lines: Stripped non-empty lines of ``text``, if already computed
 
     Returns:
         ExtractedFields with identified structured information
     """
+    cres = _compiled_fieldset()
     text_upper = text.upper()
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-    # Initialize extracted fields
-    fields = ExtractedFields()
-
-    # Extract total amount - look for common patterns
-    total_patterns = [
-        r'TOTAL[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'AMOUNT[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'SUM[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'BALANCE[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'USD\s*(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*USD',
-        r'GRAND\s*TOTAL[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-        r'SUBTOTAL[:\s]*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)'
-    ]
-
-    for pattern in total_patterns:
-        match = re.search(pattern, text_upper)
-        if match:
-            try:
+    if lines is None:
+        lines = _split_lines(text)
+
+    # Collect extracted values; the (immutable) model is built once at the end
+    fields: Dict[str, Any] = {}
+
+    # Extract total amount - prefer GRAND TOTAL over TOTAL over SUBTOTAL, etc.
+    # (skipped entirely when none of the keywords occur in the text)
+    if any(keyword in text_upper for keyword in _TOTAL_KEYWORDS):
+        best_rank = None
+        for match in cres["total"].finditer(text_upper):
+            keyword = match.group('keyword') or "USD"
+            rank = _TOTAL_PRIORITY[keyword[:5]]
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
                 # Remove commas and convert to float
-                amount_str = match.group(1).replace(',', '')
-                fields.total = float(amount_str)
-                break
-            except (ValueError, AttributeError):
+                amount_str = match.group('amount') or match.group('usd_amount')
+                fields['total'] = float(amount_str.replace(',', ''))
+                if rank == 0:
+                    break
+
+    # Extract date - first date in any of the supported formats
+    match = cres["date"].search(text_upper)
+    if match:
+        fields['date'] = match.group('date')
+
+    # Extract invoice number - prefer INVOICE over BILL over RECEIPT, etc.
+    if any(keyword in text_upper for keyword in _INVOICE_KEYWORDS):
+        best_rank = None
+        match = cres["invoice"].search(text_upper)
+        while match:
+            number = match.group('number')
+            if number in _INVOICE_KEYWORD_WORDS:
+                # Non-overlapping matches would let this capture swallow the next keyword
+                match = cres["invoice"].search(text_upper, match.end() - len(number))
                 continue
-
-    # Extract date - multiple date formats
-    date_patterns = [
-        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
-        r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',      # YYYY-MM-DD
-        r'(\d{1,2}\s+(?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s+\d{2,4})',  # DD MMM YYYY
-        r'((?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s+\d{1,2},?\s+\d{2,4})',  # MMM DD, YYYY
-    ]
-
-    for pattern in date_patterns:
-        match = re.search(pattern, text_upper)
-        if match:
-            fields.date = match.group(1)
-            break
-
-    # Extract invoice number - common patterns
-    invoice_patterns = [
-        r'INVOICE[:\s#]*(\w+[-/]?\w*)',
-        r'BILL[:\s#]*(\w+[-/]?\w*)',
-        r'RECEIPT[:\s#]*(\w+[-/]?\w*)',
-        r'ORDER[:\s#]*(\w+[-/]?\w*)',
-        r'REF(?:ERENCE)?[:\s#]*(\w+[-/]?\w*)',
-        r'ACC(?:OUNT)?[:\s#]*(\w+[-/]?\w*)'
-    ]
-
-    for pattern in invoice_patterns:
-        match = re.search(pattern, text_upper)
-        if match and len(match.group(1)) > 2:  # Avoid capturing very short strings
-            fields.invoice_number = match.group(1)
-            break
-
-    # Extract vendor/company name - look at first few lines and common patterns
-    vendor_patterns = [
-        r'^(.+?)\s+(?:INC|LLC|CORP|CORPORATION|CO|COMPANY|LTD|LIMITED)',
-        r'FROM:\s*(.+)',
-        r'VENDOR:\s*(.+)',
-        r'SUPPLIER:\s*(.+)',
-        r'MERCHANT:\s*(.+)'
-    ]
-
-    # Check first few lines for potential vendor names
-    for line in lines[:5]:
-        line_upper = line.upper()
-        for pattern in vendor_patterns:
-            match = re.search(pattern, line_upper)
-            if match and len(match.group(1).strip()) > 2:
-                fields.vendor = match.group(1).strip()
+            if len(number) > 2:  # Avoid capturing very short strings
+                rank = _INVOICE_PRIORITY[match.group('keyword')[:3]]
+                if best_rank is None or rank < best_rank:
+                    best_rank = rank
+                    fields['invoice_number'] = number
+                    if rank == 0:
+                        break
+            match = cres["invoice"].search(text_upper, match.end())
+
+    # Vendor and title both come from the first few lines; uppercase them once
+    header_upper = [line.upper() for line in lines[:5]]
+
+    # Check first few lines for potential vendor names in a single scan
+    header = "\n".join(header_upper)
+    if any(keyword in header for keyword in _VENDOR_KEYWORDS):
+        for match in cres["vendor"].finditer(header):
+            vendor = (match.group('company') or match.group('named')).strip()
+            if len(vendor) > 2:
+                fields['vendor'] = vendor
                 break
-        if fields.vendor:
-            break
 
     # Extract title/document type from first line or keywords
     if lines:
-        first_line = lines[0].upper()
-        if any(keyword in first_line for keyword in ['INVOICE', 'BILL', 'RECEIPT', 'STATEMENT']):
-            fields.title = lines[0].strip()
+        first_line = header_upper[0]
+        if any(keyword in first_line for keyword in _TITLE_KEYWORDS):
+            fields['title'] = lines[0]
         elif len(lines) > 1:
             # Check second line if first doesn't contain document type
-            second_line = lines[1].upper()
-            if any(keyword in second_line for keyword in ['INVOICE', 'BILL', 'RECEIPT', 'STATEMENT']):
-                fields.title = lines[1].strip()
+            second_line = header_upper[1]
+            if any(keyword in second_line for keyword in _TITLE_KEYWORDS):
+                fields['title'] = lines[1]
 
-    return fields
+    return ExtractedFields(**fields)
 
 
 def check_tesseract_available() -> bool:
     """Check if Tesseract OCR is available and working."""
     try:
+        if USE_TESSEROCR:
+            # The in-process API needs the English model rather than the CLI binary
+            return "eng" in tesserocr.get_languages()[1]
         pytesseract.get_tesseract_version()
         return True
     except Exception:
         return False
 
 
-def extract_text_from_image(image_path: Path) -> tuple[str, float, Dict[str, Any]]:
+def _tesserocr_recognize(image: Image.Image) -> tuple[str, float]:
+    """
+    Recognize an image with this process's tesserocr API, creating it on first use.
+
+    Returns:
+        Tuple of (extracted_text, mean_confidence)
+    """
+    global _tess_api
+    with _tess_lock:
+        if _tess_api is None:
+            _tess_api = tesserocr.PyTessBaseAPI(lang="eng", oem=tesserocr.OEM.LSTM_ONLY)
+        _tess_api.SetImage(image)
+        return _tess_api.GetUTF8Text(), float(_tess_api.MeanTextConf())
+
+
+def _ocr_page_image(size: tuple[int, int], samples: bytes) -> str:
+    """Run Tesseract on a rendered PDF page's raw grayscale pixels. Executed in the OCR process pool."""
+    image = Image.frombytes("L", size, samples)
+    if USE_TESSEROCR:
+        return _tesserocr_recognize(image)[0]
+    return pytesseract.image_to_string(image)
+
+
+def _text_from_ocr_data(ocr_data: Dict[str, List[Any]]) -> str:
+    """
+    Rebuild plain text from Tesseract's image_to_data output.
+
+    Words on the same line are joined with spaces, lines with newlines and
+    paragraphs with a blank line, mirroring image_to_string's layout.
+    """
+    parts = []
+    prev_paragraph = prev_line = None
+    for level, block_num, par_num, line_num, word in zip(
+        ocr_data['level'], ocr_data['block_num'], ocr_data['par_num'],
+        ocr_data['line_num'], ocr_data['text']
+    ):
+        # Only word-level rows (level 5) carry text
+        if level != 5 or not word.strip():
+            continue
+        paragraph = (block_num, par_num)
+        line = (block_num, par_num, line_num)
+        if prev_line is not None:
+            if paragraph != prev_paragraph:
+                parts.append("\n\n")
+            elif line != prev_line:
+                parts.append("\n")
+            else:
+                parts.append(" ")
+        parts.append(word)
+        prev_paragraph, prev_line = paragraph, line
+    return "".join(parts)
+
+
+def _ocr_image_file(image_path: Path) -> tuple[str, float, Optional[str], tuple[int, int]]:
+    """
+    Decode, prepare and recognize an image file. Executed in the OCR process pool.
+
+    With tesserocr the resident in-process API is used; otherwise a single
+    pytesseract image_to_data pass yields both the text and the per-word
+    confidences.
+
+    Returns:
+        Tuple of (extracted_text, average_confidence, image_format, image_size)
+    """
+    image = Image.open(image_path)
+    image_format, image_size = image.format, image.size
+
+    # Tesseract works on grayscale internally; shrink oversized scans before it sees them
+    image = image.convert("L")
+    if max(image.size) > OCR_MAX_DIM:
+        image.thumbnail((OCR_MAX_DIM, OCR_MAX_DIM), Image.LANCZOS)
+
+    if USE_TESSEROCR:
+        return (*_tesserocr_recognize(image), image_format, image_size)
+
+    ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    text = _text_from_ocr_data(ocr_data)
+
+    # Calculate average confidence for words that were detected
+    confidences = [int(conf) for conf in ocr_data['conf'] if int(conf) > 0]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+
+    return text, avg_confidence, image_format, image_size
+
+
+async def extract_text_from_image(image_path: Path) -> tuple[str, float, Dict[str, Any], List[str]]:
     """
     Extract text from an image file using Tesseract OCR.
 
@@ -210,113 +428,143 @@ def extract_text_from_image(image_path: Path) -> tuple[str, float, Dict[str, Any
         image_path: Path to the image file
 
     Returns:
-        Tuple of (extracted_text, confidence_score, metadata_dict)
+        Tuple of (extracted_text, confidence_score, metadata_dict, lines)
     """
     try:
-        # Open image using PIL
-        image = Image.open(image_path)
-
-        # Extract text using Tesseract
-        text = pytesseract.image_to_string(image)
-
-        # Get additional OCR data including confidence
-        ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-
-        # Calculate average confidence for words that were detected
-        confidences = [int(conf) for conf in ocr_data['conf'] if int(conf) > 0]
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        # Decoding, downscaling and recognition all run in one OCR pool worker
+        [(text, avg_confidence, image_format, image_size)] = await _run_in_ocr_pool(
+            _ocr_image_file, [(image_path,)]
+        )
 
         # Extract basic structured information
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        lines = _split_lines(text)
 
         metadata = {
             "total_lines": len(lines),
             "file_size": image_path.stat().st_size,
-            "image_format": image.format,
-            "image_size": image.size,
+            "image_format": image_format,
+            "image_size": image_size,
             "word_count": len(text.split()),
             "detected_lines": lines[:10]  # First 10 lines for preview
         }
 
-        return text, avg_confidence, metadata
+        return text, avg_confidence, metadata, lines
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
 
-def extract_text_from_pdf(pdf_path: Path) -> tuple[str, float, Dict[str, Any]]:
+def _pdf_result(
+    pdf_path: Path, text_parts: List[str], total_pages: int, used_ocr: bool
+) -> tuple[str, float, Dict[str, Any], List[str]]:
+    """Assemble the extract_text_from_pdf result from the non-empty page texts."""
+    full_text = "\n\n".join(text_parts)
+
+    # Calculate confidence (use OCR confidence if OCR was used, otherwise perfect confidence)
+    confidence = 0.8 if used_ocr else 1.0
+
+    lines = _split_lines(full_text)
+    metadata = {
+        "total_pages": total_pages,
+        "word_count": sum(len(page_text.split()) for page_text in text_parts),
+        "file_size": pdf_path.stat().st_size,
+        "has_text": bool(text_parts),
+        "extracted_lines": len(lines),
+        "used_ocr": used_ocr,
+        "detected_lines": lines[:10]  # First 10 lines for preview
+    }
+
+    return full_text, confidence, metadata, lines
+
+
+def _render_pdf_pages(doc: fitz.Document, page_count: int) -> List[tuple[tuple[int, int], bytes]]:
+    """
+    Render the first pages of a PDF to raw grayscale pixels for OCR.
+
+    Pages render at OCR_PDF_DPI, lowered where needed so that the longer side
+    of the image stays within OCR_MAX_DIM, the same cap applied to uploaded images.
+
+    Returns:
+        List of ((width, height), samples) per page
+    """
+    pages = []
+    for page_num in range(page_count):
+        page = doc.load_page(page_num)
+        dpi = min(OCR_PDF_DPI, int(OCR_MAX_DIM * 72 / max(page.rect.width, page.rect.height)))
+        pix = page.get_pixmap(dpi=max(dpi, 1), colorspace=fitz.csGRAY, alpha=False)
+        pages.append(((pix.width, pix.height), pix.samples))
+    return pages
+
+
+async def _run_in_ocr_pool(func: Callable[..., Any], calls: List[tuple]) -> List[Any]:
+    """
+    Run ``func`` once per argument tuple in parallel on the OCR process pool.
+
+    If a worker died, the broken pool is replaced and the calls are retried
+    once on fresh workers before the error is raised.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_ocr_pool()
+        try:
+            return await asyncio.gather(*(loop.run_in_executor(pool, func, *args) for args in calls))
+        except BrokenProcessPool:
+            _discard_ocr_pool(pool)
+            if attempt:
+                raise
+
+
+async def extract_text_from_pdf(pdf_path: Path) -> tuple[str, float, Dict[str, Any], List[str]]:
     """
     Extract text from a PDF file using PyMuPDF.
 
+    PDFs with an embedded text layer are returned without any rendering or
+    OCR. Scanned PDFs fall back to OCR, with the rendered pages processed in
+    parallel by the OCR process pool.
+
     Args:
         pdf_path: Path to the PDF file
 
     Returns:
-        Tuple of (extracted_text, confidence_score, metadata_dict)
+        Tuple of (extracted_text, confidence_score, metadata_dict, lines)
     """
     try:
         # Open PDF using PyMuPDF
         doc = fitz.open(pdf_path)
+        try:
+            total_pages = len(doc)
 
-        text_parts = []
-        total_words = 0
-        used_ocr = False
-
-        # Extract text from each page
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            if page_text.strip():
-                text_parts.append(page_text)
-                total_words += len(page_text.split())
-
-        # Combine all text
-        full_text = "\n\n".join(text_parts)
-
-        # If no text was found, it might be a scanned PDF - try OCR
-        if not full_text.strip():
-            used_ocr = True
-            # Convert PDF pages to images and run OCR
-            for page_num in range(min(len(doc), 5)):  # Limit to first 5 pages for performance
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img_path = pdf_path.parent / f"temp_page_{page_num}.png"
-                pix.save(img_path)
-
-                try:
-                    page_text, page_confidence, _ = extract_text_from_image(img_path)
-                    if page_text.strip():
-                        text_parts.append(page_text)
-                        total_words += len(page_text.split())
-                finally:
-                    # Clean up temporary image
-                    if img_path.exists():
-                        img_path.unlink()
-
-            full_text = "\n\n".join(text_parts)
-
-        doc.close()
-
-        # Calculate confidence (use OCR confidence if OCR was used, otherwise perfect confidence)
-        confidence = 0.8 if used_ocr else 1.0
-
-        lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-        metadata = {
-            "total_pages": len(doc),
-            "total_words": total_words,
-            "file_size": pdf_path.stat().st_size,
-            "has_text": bool(full_text.strip()),
-            "extracted_lines": len(lines),
-            "used_ocr": used_ocr,
-            "detected_lines": lines[:10]  # First 10 lines for preview
-        }
+            # Extract text from each page, keeping only pages that have any
+            text_parts = [page_text for page in doc if (page_text := page.get_text()).strip()]
+            if text_parts:
+                return _pdf_result(pdf_path, text_parts, total_pages, used_ocr=False)
+
+            # No text was found, it might be a scanned PDF - render pages to raw
+            # grayscale pixel buffers in memory (off the event loop) for OCR
+            pages = await asyncio.to_thread(
+                _render_pdf_pages, doc, min(total_pages, PDF_OCR_PAGE_LIMIT)
+            )
+        finally:
+            doc.close()
+
+        # OCR the rendered pages in parallel
+        page_texts = await _run_in_ocr_pool(_ocr_page_image, pages)
+        text_parts = [page_text for page_text in page_texts if page_text.strip()]
 
-        return full_text, confidence, metadata
+        return _pdf_result(pdf_path, text_parts, total_pages, used_ocr=True)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF processing failed: {str(e)}")
 
 
+def _tesseract_thread_limit() -> Optional[int]:
+    """Return OMP_THREAD_LIMIT as an integer, or None if it is empty or not a number."""
+    try:
+        return int(os.environ.get("OMP_THREAD_LIMIT", ""))
+    except ValueError:
+        return None
+
+
 @app.get("/")
 async def root() -> Dict[str, str]:
     """Root endpoint to check if the service is running."""
@@ -330,7 +578,8 @@ async def health_check() -> HealthResponse:
         status="healthy",
         service="ocr-service",
         version="1.0.0",
-        tesseract_available=check_tesseract_available()
+        tesseract_available=check_tesseract_available(),
+        tesseract_thread_limit=_tesseract_thread_limit()
     )
 
 
@@ -339,6 +588,9 @@ async def extract_text(file: UploadFile = File(...)):
     """
     Extract text from uploaded image or PDF file.
 
+    Re-uploads of identical content are served from an in-memory cache,
+    reported through the X-Cache response header (HIT/MISS).
+
     Args:
         file: Uploaded file (image or PDF)
 
@@ -366,28 +618,44 @@ async def extract_text(file: UploadFile = File(...)):
     file_id = str(uuid.uuid4())
     file_extension = Path(file.filename).suffix.lower() if file.filename else ".tmp"
 
-    # Create temporary file
     temp_path = None
     try:
+        # Stream the upload into a temporary file, hashing it and enforcing the size limit as we go
+        content_hash = hashlib.sha256()
+        file_size = 0
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            content = await file.read()
-            # Validate actual file size after reading
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE} bytes"
-                )
-            temp_file.write(content)
             temp_path = Path(temp_file.name)
-
-        # Process based on file type
-        if file.content_type == "application/pdf":
-            extracted_text, confidence, processing_metadata = extract_text_from_pdf(temp_path)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                # Validate actual file size while reading
+                if file_size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE} bytes"
+                    )
+                content_hash.update(chunk)
+                temp_file.write(chunk)
+
+        cache_key = (content_hash.digest(), file.content_type)
+        cached_result = _ocr_cache.get(cache_key) if _ocr_cache is not None else None
+        if cached_result is not None:
+            cache_status = "HIT"
+            extracted_text, confidence, processing_metadata, lines = cached_result
         else:
-            extracted_text, confidence, processing_metadata = extract_text_from_image(temp_path)
+            cache_status = "MISS"
+
+            # Process based on file type
+            if file.content_type == "application/pdf":
+                ocr_result = await extract_text_from_pdf(temp_path)
+            else:
+                ocr_result = await extract_text_from_image(temp_path)
+
+            if _ocr_cache is not None:
+                _ocr_cache[cache_key] = ocr_result
+            extracted_text, confidence, processing_metadata, lines = ocr_result
 
         # Extract structured fields
-        parsed_fields = extract_structured_fields(extracted_text)
+        parsed_fields = extract_structured_fields(extracted_text, lines)
 
         # Calculate processing time
         processing_time_ms = (time.time() - start_time) * 1000
@@ -396,7 +664,7 @@ async def extract_text(file: UploadFile = File(...)):
         metadata = OCRMetadata(
             original_filename=file.filename,
             content_type=file.content_type,
-            file_size=len(content),
+            file_size=file_size,
             file_id=file_id,
             processing_time_ms=processing_time_ms,
             total_pages=processing_metadata.get("total_pages"),
@@ -405,12 +673,15 @@ async def extract_text(file: UploadFile = File(...)):
             detected_lines=processing_metadata.get("detected_lines")
         )
 
-        return OCRResponse(
+        ocr_response = OCRResponse(
             success=True,
             extracted_text=extracted_text,
             parsed_fields=parsed_fields,
             metadata=metadata
         )
+        # The model is already validated; render it directly with orjson instead of
+        # re-validating and re-encoding it through response_model
+        return ORJSONResponse(content=ocr_response.model_dump(), headers={"X-Cache": cache_status})
 
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -446,4 +717,13 @@ async def internal_server_error_handler(request, exc):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7070)
\ No newline at end of file
+    # uvloop event loop and httptools parser (both shipped with uvicorn[standard]);
+    # each worker process gets its own OCR pool
+    uvicorn.run(
+        "app:app",
+        host=os.getenv("SERVICE_HOST", "0.0.0.0"),
+        port=int(os.getenv("SERVICE_PORT", 7070)),
+        loop="uvloop",
+        http="httptools",
+        workers=MAX_WORKERS
+    )
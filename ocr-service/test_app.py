@@ -9,24 +9,43 @@ This test suite covers:
 - File processing capabilities
 """
 
+import asyncio
+import io
 import os
+import signal
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from pathlib import Path
 from typing import Dict, Any
 
+from cachetools import LRUCache
+from fastapi import HTTPException, UploadFile
 from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
 from PIL import Image
 import fitz  # PyMuPDF
 
-from app import app, extract_structured_fields, check_tesseract_available, ALLOWED_FILE_TYPES
+import app as ocr_app
+from app import (
+    app, extract_structured_fields, extract_text_from_image, extract_text_from_pdf,
+    check_tesseract_available, ALLOWED_FILE_TYPES
+)
 
 
 # Create test client
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def clear_ocr_cache():
+    """Keep cached OCR results from leaking between tests."""
+    if ocr_app._ocr_cache is not None:
+        ocr_app._ocr_cache.clear()
+
+
 class TestHealthEndpoints:
     """Test health check and root endpoints."""
 
@@ -38,6 +57,7 @@ class TestHealthEndpoints:
         assert data["message"] == "OCR Service is running"
         assert data["version"] == "1.0.0"
 
+    @patch.dict(os.environ, {"OMP_THREAD_LIMIT": "1"})
     def test_health_endpoint(self):
         """Test health check endpoint with tesseract availability."""
         response = client.get("/health")
@@ -48,6 +68,14 @@ class TestHealthEndpoints:
         assert data["version"] == "1.0.0"
         assert "tesseract_available" in data
         assert isinstance(data["tesseract_available"], bool)
+        assert data["tesseract_thread_limit"] == 1
+
+    @patch.dict(os.environ, {"OMP_THREAD_LIMIT": ""})
+    def test_health_endpoint_with_invalid_thread_limit(self):
+        """Test that a malformed OMP_THREAD_LIMIT does not fail the health check."""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["tesseract_thread_limit"] is None
 
 
 class TestStructuredFieldExtraction:
@@ -65,6 +93,12 @@ class TestStructuredFieldExtraction:
         fields = extract_structured_fields(text)
         assert fields.total == 1234.56
 
+    def test_extract_total_prefers_grand_total(self):
+        """Test that GRAND TOTAL wins over TOTAL and SUBTOTAL regardless of position."""
+        text = "GRAND TOTAL: $120.00\nSUBTOTAL: $100.00\nTOTAL: $110.00"
+        fields = extract_structured_fields(text)
+        assert fields.total == 120.00
+
     def test_extract_date_formats(self):
         """Test extracting various date formats."""
         # Test MM/DD/YYYY format
@@ -83,12 +117,23 @@ class TestStructuredFieldExtraction:
         fields = extract_structured_fields(text)
         assert fields.invoice_number == "INV-2024-001"
 
+    def test_extract_invoice_number_after_adjacent_keyword(self):
+        """Test that a keyword captured as another keyword's number is not the result."""
+        fields = extract_structured_fields("BILL INVOICE 12345")
+        assert fields.invoice_number == "12345"
+
     def test_extract_vendor_name(self):
         """Test extracting vendor/company names."""
         text = "ACME CORPORATION\n123 Main St\nInvoice #123"
         fields = extract_structured_fields(text)
         assert "ACME" in fields.vendor or "CORPORATION" in fields.vendor
 
+    def test_extract_vendor_from_labelled_header_line(self):
+        """Test extracting a vendor from a FROM: label on a later header line."""
+        text = "RECEIPT\nFROM: Main Street Bakery\nTotal: $4.00"
+        fields = extract_structured_fields(text)
+        assert fields.vendor == "MAIN STREET BAKERY"
+
     def test_extract_bill_title(self):
         """Test extracting bill/document title."""
         text = "INVOICE\nBilling services for January 2024"
@@ -156,7 +201,8 @@ class TestOCREndpoints:
         mock_extract_text.return_value = (
             "INVOICE #123\nTotal: $100.00\nDue: 01/15/2024",
             95.0,
-            {"word_count": 10, "detected_lines": ["INVOICE #123", "Total: $100.00", "Due: 01/15/2024"]}
+            {"word_count": 10, "detected_lines": ["INVOICE #123", "Total: $100.00", "Due: 01/15/2024"]},
+            ["INVOICE #123", "Total: $100.00", "Due: 01/15/2024"]
         )
 
         with open(sample_image, "rb") as f:
@@ -188,7 +234,8 @@ class TestOCREndpoints:
             mock_extract_pdf.return_value = (
                 "Invoice from ACME Corp\nTotal: $250.00",
                 100.0,
-                {"total_pages": 1, "word_count": 5, "detected_lines": ["Invoice from ACME Corp", "Total: $250.00"]}
+                {"total_pages": 1, "word_count": 5, "detected_lines": ["Invoice from ACME Corp", "Total: $250.00"]},
+                ["Invoice from ACME Corp", "Total: $250.00"]
             )
 
             with open(temp_file_path, "rb") as f:
@@ -206,6 +253,55 @@ class TestOCREndpoints:
         finally:
             os.unlink(temp_file_path)
 
+    @patch('app._ocr_cache', LRUCache(maxsize=4))
+    @patch('app.extract_text_from_image')
+    def test_ocr_endpoint_caches_identical_uploads(self, mock_extract_text):
+        """Test that re-uploading the same content reuses the cached OCR result."""
+        mock_extract_text.return_value = (
+            "RECEIPT #456\nTotal: $12.00",
+            90.0,
+            {"word_count": 4, "detected_lines": ["RECEIPT #456", "Total: $12.00"]},
+            ["RECEIPT #456", "Total: $12.00"]
+        )
+
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
+            Image.new('RGB', (120, 80), color='yellow').save(temp_file.name, 'PNG')
+            temp_file_path = temp_file.name
+
+        try:
+            responses = []
+            for _ in range(2):
+                with open(temp_file_path, "rb") as f:
+                    responses.append(client.post("/ocr", files={"file": ("receipt.png", f, "image/png")}))
+        finally:
+            os.unlink(temp_file_path)
+
+        assert [r.status_code for r in responses] == [200, 200]
+        assert responses[0].headers["X-Cache"] == "MISS"
+        assert responses[1].headers["X-Cache"] == "HIT"
+        assert responses[1].json()["extracted_text"] == responses[0].json()["extracted_text"]
+        mock_extract_text.assert_called_once()
+
+    @patch('app._ocr_cache', None)  # OCR_CACHE_SIZE=0
+    @patch('app.extract_text_from_image')
+    def test_ocr_endpoint_with_cache_disabled(self, mock_extract_text, sample_image):
+        """Test that every upload is processed when the OCR cache is disabled."""
+        mock_extract_text.return_value = (
+            "RECEIPT #456\nTotal: $12.00",
+            90.0,
+            {"word_count": 4, "detected_lines": ["RECEIPT #456", "Total: $12.00"]},
+            ["RECEIPT #456", "Total: $12.00"]
+        )
+
+        responses = []
+        for _ in range(2):
+            with open(sample_image, "rb") as f:
+                responses.append(client.post("/ocr", files={"file": ("receipt.png", f, "image/png")}))
+
+        assert [r.status_code for r in responses] == [200, 200]
+        assert [r.headers["X-Cache"] for r in responses] == ["MISS", "MISS"]
+        assert mock_extract_text.call_count == 2
+
     def test_large_file_handling(self):
         """Test handling of files exceeding size limit."""
         # Create a large file (simulate large upload)
@@ -225,6 +321,248 @@ class TestOCREndpoints:
         finally:
             os.unlink(temp_file_path)
 
+    @patch('app.MAX_FILE_SIZE', 1024)
+    def test_large_file_rejected_while_streaming(self):
+        """Test that an upload without a known size is rejected once the limit is crossed mid-stream."""
+        upload = UploadFile(
+            file=io.BytesIO(b"x" * (3 * ocr_app.UPLOAD_CHUNK_SIZE)),
+            size=None,
+            filename="large.png",
+            headers=Headers({"content-type": "image/png"}),
+        )
+        temp_paths = []
+        real_named_temporary_file = tempfile.NamedTemporaryFile
+
+        def recording_named_temporary_file(*args, **kwargs):
+            temp_file = real_named_temporary_file(*args, **kwargs)
+            temp_paths.append(Path(temp_file.name))
+            return temp_file
+
+        with patch('app.tempfile.NamedTemporaryFile', side_effect=recording_named_temporary_file):
+            with pytest.raises(HTTPException) as exc_info:
+                asyncio.run(ocr_app.extract_text(upload))
+
+        assert exc_info.value.status_code == 413
+        assert len(temp_paths) == 1
+        assert not temp_paths[0].exists()
+
+
+class TestImageExtraction:
+    """Test Tesseract output handling for image files."""
+
+    @pytest.fixture(autouse=True)
+    def thread_executor(self):
+        """Run image OCR on the default thread executor so in-process patches apply."""
+        with patch('app._get_ocr_pool', return_value=None):
+            yield
+
+    @pytest.fixture
+    def sample_image(self):
+        """Create a sample image for testing."""
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
+            img = Image.new('RGB', (200, 100), color='white')
+            img.save(temp_file.name, 'PNG')
+            yield Path(temp_file.name)
+        os.unlink(temp_file.name)
+
+    @patch('app.USE_TESSEROCR', False)
+    @patch('app.pytesseract.image_to_data')
+    def test_text_and_confidence_from_single_pass(self, mock_image_to_data, sample_image):
+        """Test that text layout and confidence are rebuilt from one image_to_data call."""
+        mock_image_to_data.return_value = {
+            "level":     [1, 2, 3, 4, 5, 5, 4, 5, 3, 4, 5],
+            "block_num": [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+            "par_num":   [0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2],
+            "line_num":  [0, 0, 0, 1, 1, 1, 2, 2, 0, 1, 1],
+            "conf":      [-1, -1, -1, -1, 90, 80, -1, 70, -1, -1, 60],
+            "text":      ["", "", "", "", "INVOICE", "#123", "", "ACME", "", "", "Total"],
+        }
+
+        text, confidence, metadata, lines = asyncio.run(extract_text_from_image(sample_image))
+
+        mock_image_to_data.assert_called_once()
+        assert text == "INVOICE #123\nACME\n\nTotal"
+        assert confidence == 75.0
+        assert lines == ["INVOICE #123", "ACME", "Total"]
+        assert metadata["detected_lines"] == lines
+
+    @patch('app.USE_TESSEROCR', False)
+    @patch('app.pytesseract.image_to_data')
+    def test_oversized_image_is_downscaled_to_grayscale(self, mock_image_to_data):
+        """Test that large images are shrunk and converted to grayscale before OCR."""
+        mock_image_to_data.return_value = {
+            "level": [], "block_num": [], "par_num": [], "line_num": [], "conf": [], "text": []
+        }
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
+            Image.new('RGB', (5000, 1000), color='white').save(temp_file.name, 'PNG')
+            image_path = Path(temp_file.name)
+
+        try:
+            _, _, metadata, _ = asyncio.run(extract_text_from_image(image_path))
+        finally:
+            os.unlink(image_path)
+
+        ocr_image = mock_image_to_data.call_args[0][0]
+        assert ocr_image.mode == "L"
+        assert ocr_image.size == (2500, 500)
+        assert metadata["image_size"] == (5000, 1000)
+        assert metadata["image_format"] == "PNG"
+
+    @patch('app.USE_TESSEROCR', False)
+    @patch('app.pytesseract.image_to_data')
+    def test_image_is_decoded_off_the_event_loop(self, mock_image_to_data, sample_image):
+        """Test that image decoding runs in a worker thread rather than on the event loop."""
+        mock_image_to_data.return_value = {
+            "level": [], "block_num": [], "par_num": [], "line_num": [], "conf": [], "text": []
+        }
+        open_threads = []
+        real_open = Image.open
+
+        def recording_open(path):
+            open_threads.append(threading.current_thread())
+            return real_open(path)
+
+        with patch('app.Image.open', side_effect=recording_open):
+            asyncio.run(extract_text_from_image(sample_image))
+
+        assert open_threads and threading.main_thread() not in open_threads
+
+    @patch('app._ocr_image_file', return_value=("RECEIPT\nTotal: $5.00\n", 88.0, "PNG", (200, 100)))
+    def test_image_ocr_runs_on_ocr_pool(self, mock_ocr_image_file, sample_image):
+        """Test that image OCR is submitted to the OCR pool rather than run in the request worker."""
+        with ThreadPoolExecutor(max_workers=1) as pool, \
+                patch('app._get_ocr_pool', return_value=pool), \
+                patch.object(pool, 'submit', wraps=pool.submit) as mock_submit:
+            text, confidence, metadata, lines = asyncio.run(extract_text_from_image(sample_image))
+
+        mock_submit.assert_called_once_with(mock_ocr_image_file, sample_image)
+        assert lines == ["RECEIPT", "Total: $5.00"]
+        assert confidence == 88.0
+        assert metadata["image_size"] == (200, 100)
+
+    @patch('app.USE_TESSEROCR', True)
+    @patch('app._tess_api', None)
+    @patch('app.tesserocr')
+    def test_tesserocr_api_is_created_once_and_reused(self, mock_tesserocr, sample_image):
+        """Test that the in-process Tesseract API is loaded once and reused across calls."""
+        api = mock_tesserocr.PyTessBaseAPI.return_value
+        api.GetUTF8Text.return_value = "RECEIPT\nTotal: $5.00\n"
+        api.MeanTextConf.return_value = 88
+
+        for _ in range(2):
+            text, confidence, _, lines = asyncio.run(extract_text_from_image(sample_image))
+
+        mock_tesserocr.PyTessBaseAPI.assert_called_once()
+        assert api.SetImage.call_count == 2
+        assert text == "RECEIPT\nTotal: $5.00\n"
+        assert confidence == 88.0
+        assert lines == ["RECEIPT", "Total: $5.00"]
+
+
+def _fake_ocr_page(size, samples):
+    """Stand-in for app._ocr_page_image that OCR pool workers can unpickle."""
+    return "RECEIPT\nTotal: $9.99\n"
+
+
+class TestPdfExtraction:
+    """Test text extraction from PDF files."""
+
+    @pytest.fixture
+    def scanned_pdf(self):
+        """Create a seven-page PDF without a text layer."""
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file_path = Path(temp_file.name)
+        doc = fitz.open()
+        for _ in range(7):
+            doc.new_page()
+        doc.save(temp_file_path)
+        doc.close()
+        yield temp_file_path
+        os.unlink(temp_file_path)
+
+    @pytest.fixture
+    def fresh_ocr_pool(self):
+        """Give the test its own OCR process pool and shut it down afterwards."""
+        with patch('app._ocr_pool', None):
+            yield
+            if ocr_app._ocr_pool is not None:
+                ocr_app._ocr_pool.shutdown(cancel_futures=True)
+
+    @pytest.fixture
+    def text_pdf(self):
+        """Create a two-page PDF with an embedded text layer (second page blank)."""
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file_path = Path(temp_file.name)
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "INVOICE #INV-77")
+        page.insert_text((72, 96), "Total: $42.00")
+        doc.new_page()
+        doc.save(temp_file_path)
+        doc.close()
+        yield temp_file_path
+        os.unlink(temp_file_path)
+
+    def test_text_layer_is_extracted_without_ocr(self, text_pdf):
+        """Test that embedded PDF text is returned with page and word counts."""
+        text, confidence, metadata, lines = asyncio.run(extract_text_from_pdf(text_pdf))
+
+        assert lines == ["INVOICE #INV-77", "Total: $42.00"]
+        assert confidence == 1.0
+        assert metadata["total_pages"] == 2
+        assert metadata["word_count"] == 4
+        assert metadata["used_ocr"] is False
+
+    @patch('app._get_ocr_pool', return_value=None)  # run page OCR on the default thread executor
+    @patch('app._ocr_page_image', return_value="RECEIPT\nTotal: $9.99\n")
+    def test_scanned_pdf_falls_back_to_page_ocr(self, mock_ocr_page, mock_get_pool, scanned_pdf):
+        """Test that PDFs without a text layer are rendered and OCR'd page by page."""
+        text, confidence, metadata, lines = asyncio.run(extract_text_from_pdf(scanned_pdf))
+
+        assert mock_ocr_page.call_count == 5  # PDF_OCR_PAGE_LIMIT
+        assert lines[:2] == ["RECEIPT", "Total: $9.99"]
+        assert confidence == 0.8
+        assert metadata["total_pages"] == 7
+        assert metadata["used_ocr"] is True
+
+    @patch('app._get_ocr_pool', return_value=None)
+    @patch('app.USE_TESSEROCR', False)
+    @patch('app.pytesseract.image_to_string', return_value="")
+    def test_scanned_pdf_pages_are_rendered_grayscale_within_max_dim(self, mock_image_to_string, mock_get_pool):
+        """Test that oversized scanned pages are rendered at a lower DPI and handed to OCR as grayscale."""
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file_path = Path(temp_file.name)
+        doc = fitz.open()
+        doc.new_page(width=14400, height=7200)  # 200in x 100in
+        doc.new_page(width=612, height=792)  # US Letter
+        doc.save(temp_file_path)
+        doc.close()
+
+        try:
+            asyncio.run(extract_text_from_pdf(temp_file_path))
+        finally:
+            os.unlink(temp_file_path)
+
+        ocr_images = [call.args[0] for call in mock_image_to_string.call_args_list]
+        assert [image.mode for image in ocr_images] == ["L", "L"]
+        # Pages are OCR'd concurrently, so call order is not fixed
+        assert sorted(image.size for image in ocr_images) == [(1700, 2200), (2400, 1200)]
+
+    @patch('app._ocr_page_image', _fake_ocr_page)
+    def test_scanned_pdf_survives_killed_ocr_worker(self, scanned_pdf, fresh_ocr_pool):
+        """Test that a dead OCR worker does not break later scanned-PDF requests."""
+        asyncio.run(extract_text_from_pdf(scanned_pdf))
+        broken_pool = ocr_app._ocr_pool
+        for process in list(broken_pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+
+        _, _, metadata, lines = asyncio.run(extract_text_from_pdf(scanned_pdf))
+
+        assert ocr_app._ocr_pool is not broken_pool
+        assert lines[:2] == ["RECEIPT", "Total: $9.99"]
+        assert metadata["used_ocr"] is True
+
 
 class TestUtilityFunctions:
     """Test utility functions."""
@@ -259,7 +597,7 @@ class TestResponseModels:
         response = client.get("/health")
         assert response.status_code == 200
         data = response.json()
-        required_fields = ["status", "service", "version", "tesseract_available"]
+        required_fields = ["status", "service", "version", "tesseract_available", "tesseract_thread_limit"]
         for field in required_fields:
             assert field in data
 